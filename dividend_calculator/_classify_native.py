@@ -0,0 +1,29 @@
+"""Pythran source for an ahead-of-time compiled ``classify_years``.
+
+Compile with ``pythran _classify_native.py`` from inside the package
+directory; the resulting extension module shadows this file on import and
+``utils.classify_years`` uses it when numba is not installed.  Uncompiled,
+this is a plain Python loop and ``utils`` ignores it.
+
+The thresholds mirror ``_numba_kernels`` (pythran cannot import them).
+"""
+
+# pythran export classify_years(float64[:])
+
+
+def classify_years(vals):
+    """Count (up, stalled, reduced, stopped) year-over-year changes."""
+    up = stalled = reduced = stopped = 0
+    for i in range(1, len(vals)):
+        prev = vals[i - 1]
+        cur = vals[i]
+        tol = 1e-9 + 1e-6 * abs(prev)
+        if cur < 1e-6:
+            stopped += 1
+        elif cur > prev + tol:
+            up += 1
+        elif abs(cur - prev) <= tol:
+            stalled += 1
+        else:
+            reduced += 1
+    return up, stalled, reduced, stopped
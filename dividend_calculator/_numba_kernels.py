@@ -0,0 +1,112 @@
+"""Numba-compiled kernels for the per-ticker numeric work in ``filter``.
+
+The kernels operate on a dense ``float64`` array of yearly totals (one slot
+per calendar year, missing years filled with 0).  Numba is optional: when it
+is not installed the same functions run as plain Python.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:  # pragma: no cover - exercised only without numba
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for ``numba.njit`` when numba is unavailable."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda fn: fn
+
+
+# Totals below STOPPED_EPS count as no dividend. Two totals are equal when
+# they differ by at most STALL_ATOL + STALL_RTOL * |previous total|, the
+# numpy.isclose rule, so the tolerance scales with the size of the payout
+STOPPED_EPS = 1e-6
+STALL_ATOL = 1e-9
+STALL_RTOL = 1e-6
+
+
+@njit(cache=True)
+def classify_years_nb(vals):
+    """Count (up, stalled, reduced, stopped) year-over-year changes.
+
+    Same rules as ``utils.classify_years``.
+    """
+    up = stalled = reduced = stopped = 0
+    for i in range(1, vals.size):
+        prev = vals[i - 1]
+        cur = vals[i]
+        tol = STALL_ATOL + STALL_RTOL * abs(prev)
+        if cur < STOPPED_EPS:
+            stopped += 1
+        elif cur > prev + tol:
+            up += 1
+        elif abs(cur - prev) <= tol:
+            stalled += 1
+        else:
+            reduced += 1
+    return up, stalled, reduced, stopped
+
+
+@njit(cache=True)
+def cagr_for_years_nb(vals, years):
+    """CAGR (%) over the last ``years`` years of ``vals``, or NaN.
+
+    Starts from the first non-zero year inside the window.  Returns NaN when
+    the series does not cover the full window or has fewer than two non-zero
+    years in it.
+    """
+    last = vals.size - 1
+    start = last - years
+    if vals.size < 2 or start < 0:
+        return np.nan
+    first_idx = -1
+    non_zero = 0
+    for i in range(start, vals.size):
+        if vals[i] > 0:
+            non_zero += 1
+            if first_idx < 0:
+                first_idx = i
+    if non_zero < 2:
+        return np.nan
+    actual_years = last - first_idx
+    if actual_years <= 0:
+        return np.nan
+    return ((vals[last] / vals[first_idx]) ** (1.0 / actual_years) - 1.0) * 100.0
+
+
+@njit(cache=True)
+def ticker_metrics_nb(years, totals, starts, ends, periods):
+    """Classification and CAGRs for many tickers in one call.
+
+    ``years``/``totals`` are flat arrays of yearly totals sorted by ticker
+    then year; ticker ``i`` owns ``[starts[i], ends[i])``.  Each ticker's
+    slice is densified (missing years 0) and run through the kernels above.
+
+    Returns ``(counts, overall, cagrs)``: an ``(n, 4)`` int array of
+    (up, stalled, reduced, stopped), the overall CAGR (0 with a single year
+    of data) and an ``(n, len(periods))`` array of last-N-year CAGRs (NaN
+    where there is too little history).
+    """
+    n = starts.size
+    counts = np.zeros((n, 4), dtype=np.int64)
+    overall = np.empty(n)
+    cagrs = np.empty((n, periods.size))
+    for i in range(n):
+        lo = starts[i]
+        hi = ends[i]
+        first = years[lo]
+        vals = np.zeros(years[hi - 1] - first + 1)
+        for j in range(lo, hi):
+            vals[years[j] - first] = totals[j]
+        up, stalled, reduced, stopped = classify_years_nb(vals)
+        counts[i, 0] = up
+        counts[i, 1] = stalled
+        counts[i, 2] = reduced
+        counts[i, 3] = stopped
+        overall[i] = cagr_for_years_nb(vals, vals.size - 1) if hi - lo >= 2 else 0.0
+        for k in range(periods.size):
+            cagrs[i, k] = cagr_for_years_nb(vals, periods[k])
+    return counts, overall, cagrs
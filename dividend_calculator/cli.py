@@ -4,16 +4,28 @@ Provides sub‑commands to update data, filter stocks based on dividend
 performance, and view stats for a single ticker.
 """
 
+import ast
 import click
+import csv
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
 from tabulate import tabulate
 from datetime import datetime, timedelta
 from tqdm import tqdm
-from typing import Optional
+from types import CodeType
+from typing import Dict, Optional
 
 from . import db
 from . import fetch
 from . import utils
+from . import _numba_kernels
+
+try:
+    import numexpr
+except ImportError:  # optional, see the "fast" extra
+    numexpr = None
 
 __version__ = "1.0.0"
 
@@ -25,11 +37,38 @@ def main():
     pass
 
 
+def _is_stale(ticker, force: bool, threshold: datetime) -> bool:
+    """Whether ``ticker`` needs fresh data from Yahoo."""
+    last_updated_str = ticker["last_updated"]
+    
+    should_update = force or not last_updated_str
+    if not should_update and last_updated_str:
+        last_updated = datetime.fromisoformat(last_updated_str)
+        if last_updated < threshold:
+            should_update = True
+    return should_update
+
+
+def _update_one(symbol: str) -> Optional[str]:
+    """Fetch fresh data for ``symbol``.
+
+    Runs on a worker thread; returns an error message instead of printing so
+    the main thread can report it alongside the progress bar.
+    """
+    try:
+        fetch.fetch_dividends(symbol)
+        # fetch.fetch_dividends already updates the timestamp in DB
+    except Exception as e:
+        return f"Error fetching data for {symbol}: {e}"
+    return None
+
+
 @main.command()
 @click.option("--force", is_flag=True, help="Force update of all tickers.")
 @click.option("--max-age", default=90, help="Maximum age of data in days before refresh.")
 @click.option("--limit", default=None, type=int, help="Limit the number of tickers to update (for testing).")
-def update(force, max_age, limit):
+@click.option("--workers", default=16, show_default=True, help="Number of tickers fetched concurrently.")
+def update(force, max_age, limit, workers):
     """Refresh ticker list and fetch missing dividend/price data."""
     click.echo("Updating ticker list from NSE...")
     added = fetch.download_nse_tickers()
@@ -42,58 +81,300 @@ def update(force, max_age, limit):
     click.echo(f"Checking data for {len(tickers)} tickers...")
     
     threshold = datetime.utcnow() - timedelta(days=max_age)
+    # Staleness is a cheap local check, so only stale tickers become jobs
+    to_update = [t["symbol"] for t in tickers if _is_stale(t, force, threshold)]
 
-    for ticker in tqdm(tickers, desc="Updating data"):
-        symbol = ticker["symbol"]
-        last_updated_str = ticker["last_updated"]
-        
-        should_update = force or not last_updated_str
-        if not should_update and last_updated_str:
-            last_updated = datetime.fromisoformat(last_updated_str)
-            if last_updated < threshold:
-                should_update = True
-        
-        if should_update:
-            try:
-                new_div, new_price = fetch.fetch_dividends(symbol)
-                # fetch.fetch_dividends already updates the timestamp in DB
-            except Exception as e:
-                click.echo(f"\nError fetching data for {symbol}: {e}", err=True)
+    # Fetching is network-bound, so overlap the Yahoo requests on a thread
+    # pool; db keeps one connection per thread, so workers don't share one.
+    # This relies on db.get_connection enabling WAL so the workers' writes
+    # don't lock each other (and readers) out of the database file.
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(_update_one, symbol) for symbol in to_update]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Updating data"):
+            error = future.result()
+            if error:
+                click.echo(f"\n{error}", err=True)
 
+    # Let SQLite's planner see the freshly loaded table sizes
+    db.optimize()
 
-def get_cagr_for_years(yearly_totals: pd.Series, years: int) -> Optional[float]:
-    """Helper to calculate CAGR for the last N years.
-    
-    Fills in any missing years within the period with 0, then calculates CAGR
-    from the first non-zero value to the last year. Only returns a value if
-    the stock has been paying dividends for at least 'years' number of years.
+
+# Variables a --condition expression may reference
+CONDITION_VARS = frozenset({
+    'up', 'years_up', 'stalled', 'years_stalled',
+    'reduced', 'years_reduced', 'stopped', 'years_stopped',
+    'yield', 'last_yield', 'yield_5yr', 'five_yr_yield',
+    'cagr', 'cagr_overall', 'c3', 'c5', 'c10', 'c15', 'c20', 'c30',
+    'price', 'shares',
+})
+
+# Arithmetic, comparisons and boolean logic only - no calls, attribute
+# access or subscripts
+_CONDITION_NODES = (
+    ast.Expression, ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare, ast.IfExp,
+    ast.Name, ast.Load, ast.Constant, ast.boolop, ast.operator, ast.unaryop,
+    # Not is/in: on arrays they test identity / membership, not the values
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+
+
+def _parse_condition(condition: str) -> ast.Expression:
+    """Parse a ``--condition`` expression and check it only uses allowed syntax.
+
+    Raises ``SyntaxError`` for unparsable input and ``ValueError`` for
+    unsupported constructs or unknown variable names.
     """
-    if len(yearly_totals) < 2:
-        return None
-    
-    last_year = yearly_totals.index[-1]
-    first_dividend_year = yearly_totals.index[0]
-    start_year = last_year - years
-    
-    if first_dividend_year > start_year:
+    tree = ast.parse(condition, mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, _CONDITION_NODES):
+            raise ValueError(f"unsupported syntax '{type(node).__name__}'")
+        if isinstance(node, ast.Name) and node.id not in CONDITION_VARS:
+            raise ValueError(f"unknown variable '{node.id}'")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"unsupported constant {node.value!r}")
+    return tree
+
+
+def compile_condition(condition: str) -> CodeType:
+    """Validate a ``--condition`` expression and compile it to a code object.
+
+    Raises ``SyntaxError`` for unparsable input and ``ValueError`` for
+    unsupported constructs or unknown variable names.
+    """
+    return compile(_parse_condition(condition), '<condition>', 'eval')
+
+
+def _truth(x):
+    """Element-wise Python truthiness (NaN counts as true, like ``bool(nan)``)."""
+    return np.asarray(x) != 0
+
+
+# Helpers the vectorized condition calls in place of and/or/not/if-else,
+# which don't work element-wise on arrays. Like Python's and/or, _and and
+# _or return one of their operands rather than a boolean.
+_VECTOR_HELPERS = {
+    '_and': lambda *xs: functools.reduce(lambda a, b: np.where(_truth(a), b, a), xs),
+    '_or': lambda *xs: functools.reduce(lambda a, b: np.where(_truth(a), a, b), xs),
+    '_not': lambda x: ~_truth(x),
+    '_where': lambda cond, a, b: np.where(_truth(cond), a, b),
+}
+
+
+class _VectorizeCondition(ast.NodeTransformer):
+    """Rewrite a validated condition so it evaluates element-wise on arrays."""
+
+    @staticmethod
+    def _call(name, args):
+        return ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=args, keywords=[])
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        return self._call('_and' if isinstance(node.op, ast.And) else '_or', node.values)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return self._call('_not', [node.operand])
+        return node
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        return self._call('_where', [node.test, node.body, node.orelse])
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        # a < b < c -> (a < b) and (b < c)
+        operands = [node.left] + node.comparators
+        pairs = [
+            ast.Compare(left=operands[i], ops=[op], comparators=[operands[i + 1]])
+            for i, op in enumerate(node.ops)
+        ]
+        return self._call('_and', pairs)
+
+
+def compile_condition_vectorized(condition: str) -> CodeType:
+    """Compile a ``--condition`` so it can be evaluated once over metric arrays.
+
+    The result must be evaluated with :data:`_VECTOR_HELPERS` in its globals.
+    """
+    tree = _VectorizeCondition().visit(_parse_condition(condition))
+    return compile(ast.fix_missing_locations(tree), '<condition>', 'eval')
+
+
+# Operators numexpr evaluates like Python once every operand is a float
+# (its int64 arithmetic wraps on overflow, so integer metrics are passed as
+# float64 and integer constants must be exact as floats); division, modulo
+# and powers are left out because Python raises on them where numexpr
+# returns inf/nan silently
+_NUMEXPR_BINOPS = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*'}
+_NUMEXPR_MAX_INT = 2 ** 53
+_NUMEXPR_CMPOPS = {ast.Eq: '==', ast.NotEq: '!=', ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>='}
+
+
+def _numexpr_source(node, as_bool=False) -> Optional[str]:
+    """Translate a validated condition AST into numexpr syntax.
+
+    Returns ``None`` when the expression uses anything numexpr can't
+    evaluate with Python semantics. ``as_bool`` wraps non-boolean operands
+    in ``!= 0`` so they can feed ``&``/``|``/``~``. ``and``/``or``/``not``
+    are only translated where just their truth value is used, since
+    Python's and/or return an operand rather than a boolean.
+    """
+    if isinstance(node, ast.Expression):
+        return _numexpr_source(node.body, as_bool=True)
+    if isinstance(node, ast.Compare):
+        operands = [node.left] + node.comparators
+        parts = []
+        for i, op in enumerate(node.ops):
+            left = _numexpr_source(operands[i])
+            right = _numexpr_source(operands[i + 1])
+            if left is None or right is None or type(op) not in _NUMEXPR_CMPOPS:
+                return None
+            parts.append(f"({left} {_NUMEXPR_CMPOPS[type(op)]} {right})")
+        return parts[0] if len(parts) == 1 else "(" + " & ".join(parts) + ")"
+    is_not = isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not)
+    if (isinstance(node, ast.BoolOp) or is_not) and not as_bool:
         return None
-    
-    full_range = pd.Series(0.0, index=range(start_year, last_year + 1))
-    full_range.update(yearly_totals.astype(float))
-    
-    non_zero_vals = full_range[full_range > 0]
-    if len(non_zero_vals) < 2:
+    if isinstance(node, ast.BoolOp):
+        parts = [_numexpr_source(v, as_bool=True) for v in node.values]
+        if None in parts:
+            return None
+        joiner = " & " if isinstance(node.op, ast.And) else " | "
+        return "(" + joiner.join(parts) + ")"
+    if is_not:
+        operand = _numexpr_source(node.operand, as_bool=True)
+        return None if operand is None else f"(~{operand})"
+
+    if isinstance(node, ast.Name):
+        source = node.id
+    elif isinstance(node, ast.Constant):
+        if isinstance(node.value, int) and abs(node.value) > _NUMEXPR_MAX_INT:
+            return None
+        source = repr(float(node.value))
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _numexpr_source(node.operand)
+        if operand is None:
+            return None
+        source = f"({'-' if isinstance(node.op, ast.USub) else '+'}{operand})"
+    elif isinstance(node, ast.BinOp) and type(node.op) in _NUMEXPR_BINOPS:
+        left = _numexpr_source(node.left)
+        right = _numexpr_source(node.right)
+        if left is None or right is None:
+            return None
+        source = f"({left} {_NUMEXPR_BINOPS[type(node.op)]} {right})"
+    elif isinstance(node, ast.IfExp):
+        test = _numexpr_source(node.test, as_bool=True)
+        body = _numexpr_source(node.body)
+        orelse = _numexpr_source(node.orelse)
+        if None in (test, body, orelse):
+            return None
+        source = f"where({test}, {body}, {orelse})"
+    else:
         return None
-    
-    first_val = non_zero_vals.iloc[0]
-    first_non_zero_year = non_zero_vals.index[0]
-    last_val = full_range.iloc[-1]
-    actual_years = last_year - first_non_zero_year
-    
-    if actual_years <= 0 or first_val <= 0:
+    return f"({source} != 0)" if as_bool else source
+
+
+def compile_condition_numexpr(condition: str) -> Optional[str]:
+    """numexpr source for a ``--condition``, or ``None`` if it can't be used."""
+    if numexpr is None:
         return None
-    
-    return utils.cagr(first_val, last_val, actual_years)
+    return _numexpr_source(_parse_condition(condition))
+
+
+def evaluate_condition(condition_code: CodeType, vector_code: CodeType,
+                       metrics: Dict[str, np.ndarray], size: int,
+                       numexpr_source: Optional[str] = None):
+    """Evaluate a condition for ``size`` rows of ``metrics`` arrays.
+
+    Uses numexpr when ``numexpr_source`` is given, otherwise (or if numexpr
+    fails) a single vectorized numpy evaluation. Anything numpy can't do with
+    plain Python semantics (division by zero, overflow, ...) falls back to
+    evaluating ``condition_code`` row by row, so results and per-row errors
+    match scalar evaluation. Returns the boolean keep-mask and a list of
+    ``(row, exception)`` for rows that failed.
+    """
+    # numpy and numexpr wrap int64 overflow silently, so the integer counts
+    # are evaluated as floats; numpy then raises on overflow under errstate
+    float_metrics = {
+        name: arr.astype(np.float64) if arr.dtype.kind in 'iu' else arr
+        for name, arr in metrics.items()
+    }
+    if numexpr_source is not None:
+        try:
+            result = numexpr.evaluate(numexpr_source, local_dict=float_metrics)
+            return np.broadcast_to(_truth(result), (size,)).copy(), []
+        except Exception:
+            pass
+
+    try:
+        with np.errstate(all='raise'):
+            result = eval(vector_code, {"__builtins__": {}, **_VECTOR_HELPERS}, float_metrics)
+        return np.broadcast_to(_truth(result), (size,)).copy(), []
+    except Exception:
+        pass
+
+    mask = np.zeros(size, dtype=bool)
+    errors = []
+    # One namespace dict reused for every row, overwritten in place
+    row_vars = dict.fromkeys(metrics)
+    columns = list(metrics.items())
+    for row in range(size):
+        for name, arr in columns:
+            # "or 0" turns 0.0 back into the int 0 the scalar path always used
+            row_vars[name] = arr[row].item() or 0
+        try:
+            mask[row] = bool(eval(condition_code, {"__builtins__": {}}, row_vars))
+        except Exception as e:
+            errors.append((row, e))
+    return mask, errors
+
+
+def _cagr_or_none(vals: np.ndarray, years: int) -> Optional[float]:
+    """Run the compiled CAGR kernel over a dense yearly array, mapping NaN to None."""
+    value = _numba_kernels.cagr_for_years_nb(vals, years)
+    return None if np.isnan(value) else float(value)
+
+
+def _splits_frame(rows) -> pd.DataFrame:
+    """Split rows as a DataFrame, built from the rows without per-row dicts."""
+    if not rows:
+        return pd.DataFrame(columns=['ticker_id', 'ex_date', 'numerator', 'denominator'])
+    return pd.DataFrame.from_records(rows, columns=rows[0].keys())
+
+
+def _format_cell(value) -> str:
+    """Render a (pre-rounded) result value without trailing zeros, like tabulate."""
+    if isinstance(value, float):
+        text = f"{value:.2f}".rstrip("0").rstrip(".")
+        return "0" if text == "-0" else text
+    return str(value)
+
+
+def _format_table(results: pd.DataFrame):
+    """Lay out ``results`` as fixed-width text: ``(header, rule, row_lines)``.
+
+    Column widths are computed once over all rows, so every chunk of the
+    output lines up. Text columns are left-aligned, the rest right-aligned.
+    """
+    cells = results.apply(lambda col: col.map(_format_cell))
+    header, rule, columns = [], [], []
+    for col in results.columns:
+        width = max(len(col), int(cells[col].str.len().max()))
+        if col == "Symbol":
+            header.append(col.ljust(width))
+            columns.append(cells[col].str.ljust(width))
+        else:
+            header.append(col.rjust(width))
+            columns.append(cells[col].str.rjust(width))
+        rule.append("-" * width)
+    lines = [" | ".join(row) for row in zip(*columns)]
+    return " | ".join(header), "-+-".join(rule), lines
+
+
+# Last-N-year CAGR columns shown by filter
+CAGR_PERIODS = (3, 5, 10, 15, 20, 30)
 
 
 @main.command()
@@ -109,10 +390,28 @@ def get_cagr_for_years(yearly_totals: pd.Series, years: int) -> Optional[float]:
 @click.option("--years-reduced", type=int, help="Maximum number of years with reduced dividends.")
 @click.option("--years-stopped", type=int, help="Maximum number of years with stopped dividends.")
 @click.option("--condition", help="Arbitrary Python-style condition (e.g. '(years_stopped + years_stalled) * 2 <= years_up')")
-def filter(symbol, min_yield, max_yield, cagr_min, cagr_3yr_min, cagr_5yr_min, cagr_10yr_min, years_up, years_stalled, years_reduced, years_stopped, condition):
+@click.option("--csv", "as_csv", is_flag=True, help="Write matches as CSV to stdout instead of a table.")
+@click.option("--pretty", is_flag=True, help="Draw the result table with tabulate (slower for long lists).")
+def filter(symbol, min_yield, max_yield, cagr_min, cagr_3yr_min, cagr_5yr_min, cagr_10yr_min, years_up, years_stalled, years_reduced, years_stopped, condition, as_csv, pretty):
     """Filter stocks based on dividend criteria."""
-    # We'll fetch all dividends and group them in Python for complex CAGR/Year logic
-    # though simple filters could be done in SQL.
+    # Pre-process condition string: replace hyphens with underscores in names
+    eval_condition = condition
+    condition_code = vector_code = numexpr_source = None
+    if eval_condition:
+        # Simple replacement for common user patterns like years-up -> years_up
+        for field in ['years-up', 'years-stalled', 'years-reduced', 'years-stopped', 'avg-yield', 'cagr-overall']:
+            eval_condition = eval_condition.replace(field, field.replace('-', '_'))
+        # Validate and compile once up front rather than on every ticker
+        try:
+            condition_code = compile_condition(eval_condition)
+            vector_code = compile_condition_vectorized(eval_condition)
+            numexpr_source = compile_condition_numexpr(eval_condition)
+        except (SyntaxError, ValueError) as e:
+            raise click.BadParameter(str(e), param_hint='--condition')
+
+    # We'll fetch dividends and group them in Python for complex CAGR/Year logic,
+    # pushing down to SQL only the predicates it can evaluate exactly.
+    current_year = datetime.now().year
     
     sql_filters = []
     params = []
@@ -120,192 +419,198 @@ def filter(symbol, min_yield, max_yield, cagr_min, cagr_3yr_min, cagr_5yr_min, c
         sql_filters.append("t.symbol = ?")
         params.append(symbol)
     
+    # Yields, CAGRs and classifications only look at completed years
+    year_start = f"{current_year}-01-01"
+    sql_filters.append("d.ex_date < ?")
+    params.append(year_start)
+    
+    # An N-year CAGR needs at least N years of history and N up-years need at
+    # least N year-over-year steps, so tickers with a shorter span can't match
+    min_span = max(
+        [n for n, flag in ((3, cagr_3yr_min), (5, cagr_5yr_min), (10, cagr_10yr_min)) if flag is not None]
+        + [years_up or 0]
+    )
+    if min_span > 0:
+        sql_filters.append(
+            "d.ticker_id IN (SELECT ticker_id FROM dividends WHERE ex_date < ? GROUP BY ticker_id "
+            "HAVING CAST(strftime('%Y', MAX(ex_date)) AS INTEGER) "
+            "- CAST(strftime('%Y', MIN(ex_date)) AS INTEGER) >= ?)"
+        )
+        params.extend([year_start, min_span])
+    
+    # A positive --min-yield needs last year's dividends to sum above 0 and a
+    # positive price on last year's final dividend; any other ticker gets a
+    # yield of 0 and can never pass
+    if min_yield is not None and min_yield > 0:
+        sql_filters.append(
+            "d.ticker_id IN (SELECT g.ticker_id FROM (SELECT ticker_id, MAX(ex_date) AS last_ex "
+            "FROM dividends WHERE ex_date >= ? AND ex_date < ? GROUP BY ticker_id HAVING SUM(amount) > 0) g "
+            "JOIN prices p2 ON p2.ticker_id = g.ticker_id AND p2.ex_date = g.last_ex "
+            "WHERE p2.close_price > 0)"
+        )
+        params.extend([f"{current_year - 1}-01-01", year_start])
+    
     where_clause = ""
     if sql_filters:
         where_clause = "WHERE " + " AND ".join(sql_filters)
     
-    rows = db.query_dividends(where_clause, tuple(params))
-    if not rows:
+    df_raw = db.read_dividends_df(where_clause, tuple(params))
+    if df_raw.empty:
         click.echo("No data found matching initial criteria.")
         return
 
     # Fetch splits to adjust dividends
-    split_rows = db.get_all_splits()
-    splits_by_ticker = {}
-    for s in split_rows:
-        tid = s['ticker_id']
-        if tid not in splits_by_ticker:
-            splits_by_ticker[tid] = []
-        splits_by_ticker[tid].append(dict(s))
-
-    # Process results into a DataFrame
-    df_raw = [dict(r) for r in rows]
-    
-    # Adjust dividends for splits per ticker
-    df_adjusted = []
-    ticker_ids = {r['ticker_id'] for r in df_raw}
-    for tid in ticker_ids:
-        ticker_divs = [r for r in df_raw if r['ticker_id'] == tid]
-        ticker_splits = splits_by_ticker.get(tid, [])
-        df_adjusted.extend(utils.adjust_dividends(ticker_divs, ticker_splits))
-
-    df = pd.DataFrame(df_adjusted)
-    df['ex_date'] = pd.to_datetime(df['ex_date'])
-    df['year'] = df['ex_date'].dt.year
-    
-    results = []
+    splits_df = db.read_all_splits_df()
+    # Final share count per ticker based on ALL splits in DB (even after last dividend)
+    ratios = splits_df['numerator'] / splits_df['denominator']
+    final_shares_by_ticker = ratios.groupby(splits_df['ticker_id']).prod().to_dict()
+
+    # Adjust dividends for splits across all tickers in one vectorized pass
+    df = utils.adjust_dividends_df(df_raw, splits_df)
     
-    # Pre-process condition string: replace hyphens with underscores in names
-    eval_condition = condition
-    if eval_condition:
-        # Simple replacement for common user patterns like years-up -> years_up
-        for field in ['years-up', 'years-stalled', 'years-reduced', 'years-stopped', 'avg-yield', 'cagr-overall']:
-            eval_condition = eval_condition.replace(field, field.replace('-', '_'))
+    # Yearly raw and forward-adjusted totals per (symbol, year) in a single
+    # groupby (the current year was already excluded in SQL)
+    yearly = df.groupby(['symbol', 'year']).agg(raw_amount=('raw_amount', 'sum'), amount=('amount', 'sum'))
+    yearly_all = yearly['amount']
 
-    for sym, group in df.groupby('symbol'):
-        ticker_id = group['ticker_id'].iloc[0]
-        curr_price = group['current_price'].iloc[0] if 'current_price' in group.columns else None
+    # Yearly yield per (symbol, year): total raw dividend of the year / raw
+    # price on the year's last dividend date. Same semantics as
+    # utils.dividend_yield; years whose last dividend has no price are left out.
+    # df is already sorted by ex_date, and groupby's 'last' would skip a
+    # missing price, so take the last row per year instead.
+    last_rows = df.drop_duplicates(['symbol', 'year'], keep='last')
+    last_close = last_rows.set_index(['symbol', 'year'])['close_price'].astype(float)
+    amt = yearly['raw_amount'].to_numpy(dtype=np.float64)
+    cp = last_close.reindex(yearly.index).to_numpy(dtype=np.float64)
+    yearly_yield = np.where(cp > 0, amt / np.where(cp > 0, cp, 1.0) * 100.0, 0.0)
+    has_price = ~np.isnan(cp)
 
-        # Calculate final share count based on ALL splits in DB (even after last dividend)
-        all_splits = splits_by_ticker.get(ticker_id, [])
-        final_shares = 1.0
-        for s in all_splits:
-            final_shares *= (s['numerator'] / s['denominator'])
+    # yearly_all is sorted by (symbol, year), so each symbol's years are one
+    # contiguous slice of these flat arrays
+    symbol_arr = yearly_all.index.get_level_values(0).to_numpy()
+    year_arr = yearly_all.index.get_level_values(1).to_numpy(dtype=np.int64)
+    amount_arr = yearly_all.to_numpy(dtype=np.float64)
+    symbols, starts = np.unique(symbol_arr, return_index=True)
+    ends = np.append(starts[1:], len(amount_arr))
+    n_symbols = len(symbols)
 
-        # Calculate yield - total dividend of year / price on last dividend date
-        from datetime import datetime
-        current_year = datetime.now().year
-        last_year = current_year - 1
-        
-        last_year_divs = group[group['year'] == last_year].sort_values('ex_date')
-        
-        last_yield = 0
-        if len(last_year_divs) > 0:
-            raw_col = 'raw_amount' if 'raw_amount' in last_year_divs.columns else 'amount'
-            total_div = last_year_divs[raw_col].sum()
-            last_div_row = last_year_divs.iloc[-1]
-            if pd.notna(last_div_row.get('close_price')) and pd.notna(total_div):
-                last_yield = utils.dividend_yield(float(total_div), float(last_div_row.get('close_price')))
-        
-        # Calculate 5-year average yield
-        five_yr_ago = current_year - 5
-        
-        five_yr_yield = 0
-        yearly_yields = []
-        for yr in range(five_yr_ago, current_year):
-            yr_divs = group[group['year'] == yr].sort_values('ex_date')
-            if len(yr_divs) > 0:
-                raw_col = 'raw_amount' if 'raw_amount' in yr_divs.columns else 'amount'
-                total_div = yr_divs[raw_col].sum()
-                last_div_row = yr_divs.iloc[-1]
-                if pd.notna(last_div_row.get('close_price')) and pd.notna(total_div):
-                    yearly_yields.append(utils.dividend_yield(float(total_div), float(last_div_row.get('close_price'))))
-        if yearly_yields:
-            five_yr_yield = sum(yearly_yields) / len(yearly_yields)
-        
-        if min_yield is not None and last_yield < min_yield:
-            continue
-        if max_yield is not None and last_yield > max_yield:
-            continue
-            
-        # Yearly totals for CAGR and classifications - exclude current year
-        from datetime import datetime
-        current_year = datetime.now().year
-        yearly_totals = group[group['year'] < current_year].groupby('year')['amount'].sum().sort_index()
-        
-        # Skip if no data
-        if len(yearly_totals) == 0:
-            continue
-        
-        # Classification - fill missing years with 0
-        min_year = int(yearly_totals.index.min())
-        max_year = int(yearly_totals.index.max())
-        full_year_range = pd.Series(0.0, index=range(min_year, max_year + 1))
-        full_year_range.update(yearly_totals.astype(float))
-        yearly_totals_list = full_year_range.tolist()
-        
-        # Classification
-        up, stalled, reduced, stopped = utils.classify_years(yearly_totals_list)
-        
-        if years_up is not None and up < years_up:
-            continue
-        if years_stalled is not None and stalled > years_stalled:
-            continue
-        if years_reduced is not None and reduced > years_reduced:
-            continue
-        if years_stopped is not None and stopped > years_stopped:
-            continue
-            
-        # CAGRs - use get_cagr_for_years for consistency with stats
-        cagr_overall = get_cagr_for_years(yearly_totals, yearly_totals.index[-1] - yearly_totals.index[0]) if len(yearly_totals) >= 2 else 0
-        
-        if cagr_min is not None and cagr_overall < cagr_min:
-            continue
-            
-        c3 = get_cagr_for_years(yearly_totals, 3)
-        c5 = get_cagr_for_years(yearly_totals, 5)
-        c10 = get_cagr_for_years(yearly_totals, 10)
-        c15 = get_cagr_for_years(yearly_totals, 15)
-        c20 = get_cagr_for_years(yearly_totals, 20)
-        c30 = get_cagr_for_years(yearly_totals, 30)
-        
-        if cagr_3yr_min is not None and (c3 is None or c3 < cagr_3yr_min):
-            continue
-        if cagr_5yr_min is not None and (c5 is None or c5 < cagr_5yr_min):
-            continue
-        if cagr_10yr_min is not None and (c10 is None or c10 < cagr_10yr_min):
-            continue
-
-        # Evaluate arbitrary condition if provided
-        if eval_condition:
-            eval_vars = {
-                'up': up, 'years_up': up,
-                'stalled': stalled, 'years_stalled': stalled,
-                'reduced': reduced, 'years_reduced': reduced,
-                'stopped': stopped, 'years_stopped': stopped,
-                'yield': last_yield, 'last_yield': last_yield,
-                'yield_5yr': five_yr_yield, 'five_yr_yield': five_yr_yield,
-                'cagr': cagr_overall, 'cagr_overall': cagr_overall,
-                'c3': c3 or 0, 'c5': c5 or 0, 'c10': c10 or 0,
-                'c15': c15 or 0, 'c20': c20 or 0, 'c30': c30 or 0,
-                'price': curr_price or 0,
-                'shares': final_shares
-            }
-            try:
-                if not eval(eval_condition, {"__builtins__": {}}, eval_vars):
-                    continue
-            except Exception as e:
-                click.echo(f"Error evaluating condition '{condition}' for {sym}: {e}", err=True)
-                continue
-            
-        res = {
-            "Symbol": sym,
-            "Price": round(curr_price, 2) if curr_price is not None else "N/A",
-            "Shares": round(final_shares, 2),
-            "Yield (%)": round(last_yield, 2),
-            "Yield 5Yr (%)": round(five_yr_yield, 2),
-            "CAGR Overall (%)": round(cagr_overall, 2),
-            "3Yr": round(c3, 2) if c3 is not None else "N/A",
-            "5Yr": round(c5, 2) if c5 is not None else "N/A",
-            "10Yr": round(c10, 2) if c10 is not None else "N/A",
-            "15Yr": round(c15, 2) if c15 is not None else "N/A",
-            "20Yr": round(c20, 2) if c20 is not None else "N/A",
-            "30Yr": round(c30, 2) if c30 is not None else "N/A",
-            "Yrs Up": up,
-            "Yrs Stalled": stalled,
-            "Yrs Reduced": reduced,
-            "Yrs Stopped": stopped
+    # Per-symbol current price and final share count, aligned with symbols
+    ticker_info = df.drop_duplicates('symbol').set_index('symbol').reindex(symbols)
+    price_arr = ticker_info['current_price'].to_numpy(dtype=np.float64)
+    shares_arr = ticker_info['ticker_id'].map(final_shares_by_ticker).fillna(1.0).to_numpy(dtype=np.float64)
+
+    # Per-symbol yields from the flat (symbol, year) arrays: last year's yield
+    # (0 without one) and the mean over the last 5 years that have one
+    # (current_year was fixed before the query)
+    last_year = current_year - 1
+    five_yr_ago = current_year - 5
+    codes = np.repeat(np.arange(n_symbols), ends - starts)
+    in_last = has_price & (year_arr == last_year)
+    last_yield_arr = np.zeros(n_symbols)
+    last_yield_arr[codes[in_last]] = yearly_yield[in_last]
+    in_five = has_price & (year_arr >= five_yr_ago) & (year_arr < current_year)
+    five_sum = np.bincount(codes[in_five], weights=yearly_yield[in_five], minlength=n_symbols)
+    five_count = np.bincount(codes[in_five], minlength=n_symbols)
+    five_yr_yield_arr = np.where(five_count > 0, five_sum / np.maximum(five_count, 1), 0.0)
+
+    # Cheapest checks first: the yield bounds only need the arrays above, so
+    # symbols they reject never reach the classification/CAGR kernel
+    keep_yield = np.ones(n_symbols, dtype=bool)
+    if min_yield is not None:
+        keep_yield &= last_yield_arr >= min_yield
+    if max_yield is not None:
+        keep_yield &= last_yield_arr <= max_yield
+    cand = np.flatnonzero(keep_yield)
+
+    # Classification and every CAGR for the remaining symbols in one compiled
+    # call. CAGRs are NaN where there's too little history; the ">=" checks
+    # below reject NaN.
+    counts, cagr_overall, cagr_matrix = _numba_kernels.ticker_metrics_nb(
+        year_arr, amount_arr, starts[cand].astype(np.int64), ends[cand].astype(np.int64),
+        np.array(CAGR_PERIODS, dtype=np.int64),
+    )
+    up_all, stalled_all, reduced_all, stopped_all = counts.T
+    cagr_by_period = dict(zip(CAGR_PERIODS, cagr_matrix.T))
+
+    # The remaining built-in flags as one boolean mask over the candidates.
+    # Symbols without any completed-year dividends aren't in yearly_all at all.
+    keep = np.ones(len(cand), dtype=bool)
+    if years_up is not None:
+        keep &= up_all >= years_up
+    if years_stalled is not None:
+        keep &= stalled_all <= years_stalled
+    if years_reduced is not None:
+        keep &= reduced_all <= years_reduced
+    if years_stopped is not None:
+        keep &= stopped_all <= years_stopped
+    if cagr_min is not None:
+        keep &= cagr_overall >= cagr_min
+    for n, flag in ((3, cagr_3yr_min), (5, cagr_5yr_min), (10, cagr_10yr_min)):
+        if flag is not None:
+            keep &= cagr_by_period[n] >= flag
+    local = np.flatnonzero(keep)
+    rows = cand[local]
+    n_results = len(rows)
+
+    # Struct-of-arrays result table, one entry per remaining candidate.
+    # Missing values (no price, too little history for a CAGR) stay NaN.
+    out = {
+        "Symbol": symbols[rows],
+        "Price": price_arr[rows],
+        "Shares": shares_arr[rows],
+        "Yield (%)": last_yield_arr[rows],
+        "Yield 5Yr (%)": five_yr_yield_arr[rows],
+        "CAGR Overall (%)": cagr_overall[local],
+        **{f"{n}Yr": cagr_by_period[n][local] for n in CAGR_PERIODS},
+        "Yrs Up": up_all[local],
+        "Yrs Stalled": stalled_all[local],
+        "Yrs Reduced": reduced_all[local],
+        "Yrs Stopped": stopped_all[local],
+    }
+
+    # Evaluate the arbitrary condition once over all remaining candidates
+    keep = slice(0, n_results)
+    if condition_code is not None and n_results:
+        metrics = {
+            'up': out["Yrs Up"], 'years_up': out["Yrs Up"],
+            'stalled': out["Yrs Stalled"], 'years_stalled': out["Yrs Stalled"],
+            'reduced': out["Yrs Reduced"], 'years_reduced': out["Yrs Reduced"],
+            'stopped': out["Yrs Stopped"], 'years_stopped': out["Yrs Stopped"],
+            'yield': out["Yield (%)"], 'last_yield': out["Yield (%)"],
+            'yield_5yr': out["Yield 5Yr (%)"], 'five_yr_yield': out["Yield 5Yr (%)"],
+            'cagr': out["CAGR Overall (%)"], 'cagr_overall': out["CAGR Overall (%)"],
+            # Periods without enough history count as 0
+            'c3': np.nan_to_num(out["3Yr"], nan=0.0),
+            'c5': np.nan_to_num(out["5Yr"], nan=0.0),
+            'c10': np.nan_to_num(out["10Yr"], nan=0.0),
+            'c15': np.nan_to_num(out["15Yr"], nan=0.0),
+            'c20': np.nan_to_num(out["20Yr"], nan=0.0),
+            'c30': np.nan_to_num(out["30Yr"], nan=0.0),
+            # Tickers without a current price count as 0, like the c* periods
+            'price': np.nan_to_num(out["Price"], nan=0.0),
+            'shares': out["Shares"],
         }
-        results.append(res)
-        
-    if not results:
+        mask, errors = evaluate_condition(
+            condition_code, vector_code, metrics, n_results, numexpr_source
+        )
+        for row, e in errors:
+            click.echo(f"Error evaluating condition '{condition}' for {out['Symbol'][row]}: {e}", err=True)
+        keep = np.nonzero(mask)[0]
+        n_results = len(keep)
+
+    if n_results == 0:
         click.echo("No stocks matched all filters.")
     else:
-        # Clean up results (handle NaN)
-        for res in results:
-            for k, v in res.items():
-                if pd.isna(v):
-                    res[k] = "N/A"
+        results = pd.DataFrame({col: arr[keep] for col, arr in out.items()}).round(2)
+        if as_csv:
+            # Stream rows straight out, missing values as empty cells
+            writer = csv.writer(click.get_text_stream("stdout"), lineterminator="\n")
+            writer.writerow(results.columns)
+            writer.writerows(results.astype(object).where(results.notna(), "").itertuples(index=False))
+            return
+
+        # Show NaN as N/A
+        results = results.astype(object).where(results.notna(), "N/A")
 
         click.echo(f"Found {len(results)} stocks matching your criteria:\n")
 
@@ -313,11 +618,16 @@ def filter(symbol, min_yield, max_yield, cagr_min, cagr_3yr_min, cagr_5yr_min, c
         header_interval = 30
         legend_tip = "COLUMNS: CAGR=% Growth, Yrs Up=Increased, Stalled=Unchanged, Reduced=Decreased, Stopped=Zero"
         
+        if not pretty:
+            header, rule, lines = _format_table(results)
         for i in range(0, len(results), header_interval):
             if i > 0:
                 click.echo(f"\n{legend_tip}")
-            chunk = results[i:i + header_interval]
-            click.echo(tabulate(chunk, headers="keys", tablefmt="grid"))
+            if pretty:
+                chunk = results.iloc[i:i + header_interval]
+                click.echo(tabulate(chunk, headers="keys", tablefmt="psql", showindex=False))
+            else:
+                click.echo("\n".join([header, rule] + lines[i:i + header_interval]))
 
         click.echo("\n" + "="*40)
         click.echo("DETAILED COLUMN LEGEND (FORWARD-ADJUSTED MODEL):")
@@ -341,25 +651,23 @@ def filter(symbol, min_yield, max_yield, cagr_min, cagr_3yr_min, cagr_5yr_min, c
 def stats(symbol):
     """Show detailed dividend statistics for a single ticker."""
     # Get ticker id first
-    tickers = db.get_all_tickers()
-    ticker = next((t for t in tickers if t['symbol'] == symbol), None)
+    ticker = db.get_ticker_by_symbol(symbol)
     if not ticker:
         click.echo(f"Ticker {symbol} not found in DB.")
         return
     
     ticker_id = ticker['id']
-    rows = db.query_dividends("WHERE t.symbol = ?", (symbol,))
-    if not rows:
+    # Columns straight from the cursor, no sqlite3.Row per dividend
+    df_raw = db.read_dividends_df("WHERE t.symbol = ?", (symbol,))
+    if df_raw.empty:
         click.echo(f"No data found for {symbol}. Try running 'update' first.")
         return
         
     splits = db.get_splits(ticker_id)
-    df_raw = [dict(r) for r in rows]
-    df_adjusted = utils.adjust_dividends(df_raw, [dict(s) for s in splits])
-
-    df = pd.DataFrame(df_adjusted)
-    df['ex_date'] = pd.to_datetime(df['ex_date'])
-    df['year'] = df['ex_date'].dt.year
+    splits_df = _splits_frame(splits)
+    # Same vectorized split adjustment as filter; it also parses ex_date,
+    # which the "Recent Payments" table needs (the year comes from the query)
+    df = utils.adjust_dividends_df(df_raw, splits_df)
     
     click.echo(f"--- {symbol} Dividend Stats (Split-Adjusted) ---")
     
@@ -368,51 +676,48 @@ def stats(symbol):
         click.echo(tabulate([(s['ex_date'], f"{s['numerator']}:{s['denominator']}") for s in splits], 
                            headers=["Ex‑Date", "Ratio"], tablefmt="simple"))
     
-    # For CAGR and classification, use forward-adjusted to show growth of 1 original share
-    yearly_forward = df.groupby('year')['amount'].sum().sort_index()
-    
-    # Show yearly totals - get raw, shares at time, and count
-    yearly_data = df.groupby('year').agg({
-        'raw_amount': 'sum',
-        'splits_at_time': 'first',
-        'id': 'count'
-    }).sort_index(ascending=False)
+    # One groupby for everything per year: forward-adjusted total (CAGR and
+    # classification, growth of 1 original share), raw total, shares at time
+    # and count for the yearly table
+    yearly = df.groupby('year').agg(
+        amount=('amount', 'sum'),
+        raw_amount=('raw_amount', 'sum'),
+        splits_at_time=('splits_at_time', 'first'),
+        count=('id', 'count'),
+    ).sort_index()
+    yearly_forward = yearly['amount']
+    yearly_data = yearly.sort_index(ascending=False)
     
     # Calculate consolidated = raw * shares at that time
     yearly_combined = pd.DataFrame({
         'Raw': yearly_data['raw_amount'],
         'Shares': yearly_data['splits_at_time'],
         'Consolidated': yearly_data['raw_amount'] * yearly_data['splits_at_time'],
-        'Dividends Announced': yearly_data['id']
+        'Dividends Announced': yearly_data['count']
     })
     
     click.echo("\nYearly Totals (Consolidated):")
     click.echo(tabulate(yearly_combined, headers="keys", tablefmt="simple"))
     
     # Exclude current year from CAGR calculation (use completed years only)
-    from datetime import datetime
     current_year = datetime.now().year
     yearly_forward_complete = yearly_forward[yearly_forward.index < current_year]
     
     click.echo(f"\nCAGR Stats (Forward-Adjusted, excluding {current_year}):")
-    cagrs = [
-        ("Overall", get_cagr_for_years(yearly_forward_complete, yearly_forward_complete.index[-1] - yearly_forward_complete.index[0]) if len(yearly_forward_complete) > 1 else 0),
-        ("3 Year", get_cagr_for_years(yearly_forward_complete, 3)),
-        ("5 Year", get_cagr_for_years(yearly_forward_complete, 5)),
-        ("10 Year", get_cagr_for_years(yearly_forward_complete, 10)),
-        ("15 Year", get_cagr_for_years(yearly_forward_complete, 15)),
-        ("20 Year", get_cagr_for_years(yearly_forward_complete, 20)),
-        ("30 Year", get_cagr_for_years(yearly_forward_complete, 30)),
-    ]
+    # One zero-filled yearly array serves both the CAGRs and the
+    # classification (missing years count as 0 for accurate counts)
+    vals = utils.fill_year_range(yearly_forward_complete.index, yearly_forward_complete.to_numpy())
+    if len(yearly_forward_complete) > 1:
+        cagr_by_period = {n: _cagr_or_none(vals, n) for n in CAGR_PERIODS}
+        overall = _cagr_or_none(vals, len(vals) - 1)
+    else:
+        cagr_by_period = {n: None for n in CAGR_PERIODS}
+        overall = 0
+    cagrs = [("Overall", overall)] + [(f"{n} Year", cagr_by_period[n]) for n in CAGR_PERIODS]
     click.echo(tabulate([(n, f"{v:.2f}%" if v else "N/A") for n, v in cagrs], headers=["Period", "CAGR"], tablefmt="simple"))
     
-    # Yearly changes classification - fill missing years with 0 for accurate counts
-    min_year = yearly_forward_complete.index.min()
-    max_year = yearly_forward_complete.index.max()
-    full_year_range = pd.Series(0.0, index=range(min_year, max_year + 1))
-    full_year_range.update(yearly_forward_complete.astype(float))
-    yearly_forward_complete_list = full_year_range.tolist()
-    up, stalled, reduced, stopped = utils.classify_years(yearly_forward_complete_list)
+    # Yearly changes classification
+    up, stalled, reduced, stopped = utils.classify_years(vals)
     click.echo("\nYear-over-Year Summary:")
     click.echo(f"Years Up:      {up}")
     click.echo(f"Years Stalled: {stalled}")
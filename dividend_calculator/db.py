@@ -4,10 +4,16 @@ Provides a thin wrapper around SQLite with helper functions to create the
 schema, insert data and run queries needed by the CLI.
 """
 
+import os
 import sys
 import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Iterator
+
+import pandas as pd
 
 def get_app_dir():
     """Get the directory where the app data should be stored.
@@ -64,43 +70,105 @@ CREATE TABLE IF NOT EXISTS splits (
     FOREIGN KEY(ticker_id) REFERENCES tickers(id) ON DELETE CASCADE
 );
 """
+# No separate ticker_id indexes are needed: the UNIQUE(ticker_id, ex_date)
+# constraints (and the prices primary key) already create indexes led by
+# ticker_id, which the per-symbol lookups and the prices join seek on.
+
+
+# Applied to every new connection. WAL lets readers run alongside the
+# concurrent writers of ``update`` and, with synchronous=NORMAL, avoids an
+# fsync per commit; the rest enlarge the page cache (64 MB) and use memory
+# for temp tables and memory-mapped reads (256 MB).
+PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA cache_size=-65536;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+"""
+
+
+# One connection per thread, opened on first use and kept for the life of the
+# process. ``update`` writes from a pool of worker threads, and an sqlite3
+# connection must not be used by two threads at once.
+_local = threading.local()
 
 
 def get_connection() -> sqlite3.Connection:
-    """Return a connection to the SQLite database, creating it if needed."""
+    """Return this thread's connection to the SQLite database.
+
+    The connection is created (along with the database file) on first use
+    and reused afterwards. It is reopened if ``DB_PATH`` has changed.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == DB_PATH:
+        return conn
+    _reset_connection()
     try:
-        conn = sqlite3.connect(str(DB_PATH))
+        # Generous busy timeout: update writes from several threads at once
+        conn = sqlite3.connect(str(DB_PATH), timeout=30)
         conn.row_factory = sqlite3.Row
-        return conn
+        conn.executescript(PRAGMAS)
     except sqlite3.OperationalError as e:
         print(f"Error opening database at {DB_PATH}: {e}")
         raise
+    _local.conn = conn
+    _local.path = DB_PATH
+    return conn
+
+
+def _reset_connection() -> None:
+    """Close this thread's cached connection, if any."""
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    if conn is not None:
+        conn.close()
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """Yield the connection with its writes committed together on exit.
+
+    Pass the yielded connection as ``conn`` to the write helpers below to
+    batch them into one commit; everything is rolled back if the block raises.
+    """
+    conn = get_connection()
+    with conn:
+        yield conn
+
+
+@contextmanager
+def _writer(conn: Optional[sqlite3.Connection]) -> Iterator[sqlite3.Connection]:
+    """Use ``conn`` as-is (the caller commits), or commit on the shared one."""
+    if conn is not None:
+        yield conn
+        return
+    conn = get_connection()
+    with conn:
+        yield conn
 
 
 def init_db() -> None:
     """Create tables if they do not exist."""
     conn = get_connection()
+    conn.executescript(SCHEMA)
+    # Add current_price if it doesn't exist (for existing DBs)
     try:
-        conn.executescript(SCHEMA)
-        # Add current_price if it doesn't exist (for existing DBs)
-        try:
-            conn.execute("ALTER TABLE tickers ADD COLUMN current_price REAL")
-        except sqlite3.OperationalError:
-            pass # Already exists
-        conn.commit()
-    finally:
-        conn.close()
+        conn.execute("ALTER TABLE tickers ADD COLUMN current_price REAL")
+    except sqlite3.OperationalError:
+        pass # Already exists
+    conn.commit()
 
 
 def upsert_ticker(symbol: str, name: Optional[str] = None,
                   sector: Optional[str] = None,
-                  market_cap: Optional[float] = None) -> int:
+                  market_cap: Optional[float] = None,
+                  conn: Optional[sqlite3.Connection] = None) -> int:
     """Insert or ignore a ticker and return its id.
 
     If the ticker already exists the existing id is returned.
     """
-    conn = get_connection()
-    try:
+    with _writer(conn) as conn:
         cur = conn.cursor()
         cur.execute(
             "INSERT OR IGNORE INTO tickers (symbol, name, sector, market_cap) VALUES (?,?,?,?)",
@@ -109,113 +177,178 @@ def upsert_ticker(symbol: str, name: Optional[str] = None,
         # Retrieve the id (whether newly inserted or existing)
         cur.execute("SELECT id FROM tickers WHERE symbol = ?", (symbol,))
         row = cur.fetchone()
-        conn.commit()
         return row["id"]
-    finally:
-        conn.close()
 
 
-def update_ticker_timestamp(ticker_id: int, timestamp: str) -> None:
+def bulk_upsert_tickers(rows: List[Tuple[str, Optional[str]]],
+                        conn: Optional[sqlite3.Connection] = None) -> None:
+    """Insert many ``(symbol, name)`` tickers, ignoring existing symbols."""
+    with _writer(conn) as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO tickers (symbol, name) VALUES (?,?)", rows
+        )
+
+
+def update_ticker_timestamp(ticker_id: int, timestamp: str,
+                            conn: Optional[sqlite3.Connection] = None) -> None:
     """Set the last_updated column for a ticker."""
-    conn = get_connection()
-    try:
+    with _writer(conn) as conn:
         conn.execute(
             "UPDATE tickers SET last_updated = ? WHERE id = ?",
             (timestamp, ticker_id),
         )
-        conn.commit()
-    finally:
-        conn.close()
 
 
-def update_ticker_price(ticker_id: int, price: float) -> None:
+def update_ticker_price(ticker_id: int, price: float,
+                        conn: Optional[sqlite3.Connection] = None) -> None:
     """Set the current_price column for a ticker."""
-    conn = get_connection()
-    try:
+    with _writer(conn) as conn:
         conn.execute(
             "UPDATE tickers SET current_price = ? WHERE id = ?",
             (price, ticker_id),
         )
-        conn.commit()
-    finally:
-        conn.close()
+
+
+def optimize() -> None:
+    """Refresh the query planner's statistics after a bulk load."""
+    get_connection().execute("ANALYZE")
 
 
 def get_ticker_last_updated(ticker_id: int) -> Optional[str]:
     conn = get_connection()
-    try:
-        cur = conn.execute(
-            "SELECT last_updated FROM tickers WHERE id = ?", (ticker_id,)
-        )
-        row = cur.fetchone()
-        return row["last_updated"] if row else None
-    finally:
-        conn.close()
+    cur = conn.execute(
+        "SELECT last_updated FROM tickers WHERE id = ?", (ticker_id,)
+    )
+    row = cur.fetchone()
+    return row["last_updated"] if row else None
 
 
 def insert_dividend(ticker_id: int, ex_date: str, amount: float,
                      pay_date: Optional[str] = None,
-                     currency: Optional[str] = None) -> None:
+                     currency: Optional[str] = None,
+                     conn: Optional[sqlite3.Connection] = None) -> None:
     """Insert a dividend record, ignoring duplicates."""
-    conn = get_connection()
-    try:
+    with _writer(conn) as conn:
         conn.execute(
             "INSERT OR IGNORE INTO dividends (ticker_id, ex_date, pay_date, amount, currency) "
             "VALUES (?,?,?,?,?)",
             (ticker_id, ex_date, pay_date, amount, currency),
         )
-        conn.commit()
-    finally:
-        conn.close()
 
 
-def insert_price(ticker_id: int, ex_date: str, close_price: float) -> None:
+def insert_price(ticker_id: int, ex_date: str, close_price: float,
+                 conn: Optional[sqlite3.Connection] = None) -> None:
     """Insert a price record, ignoring duplicates."""
-    conn = get_connection()
-    try:
+    with _writer(conn) as conn:
         conn.execute(
             "INSERT OR REPLACE INTO prices (ticker_id, ex_date, close_price) VALUES (?,?,?)",
             (ticker_id, ex_date, close_price),
         )
-        conn.commit()
-    finally:
-        conn.close()
 
 
-def insert_split(ticker_id: int, ex_date: str, numerator: float, denominator: float) -> None:
+def insert_split(ticker_id: int, ex_date: str, numerator: float, denominator: float,
+                 conn: Optional[sqlite3.Connection] = None) -> None:
     """Insert a split record, ignoring duplicates."""
-    conn = get_connection()
-    try:
+    with _writer(conn) as conn:
         conn.execute(
             "INSERT OR IGNORE INTO splits (ticker_id, ex_date, numerator, denominator) VALUES (?,?,?,?)",
             (ticker_id, ex_date, numerator, denominator),
         )
-        conn.commit()
-    finally:
-        conn.close()
+
+
+def bulk_insert_dividends(ticker_id: int, rows: List[Tuple[str, float]],
+                          conn: Optional[sqlite3.Connection] = None) -> None:
+    """Insert many ``(ex_date, amount)`` dividend rows, ignoring duplicates."""
+    with _writer(conn) as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO dividends (ticker_id, ex_date, amount) VALUES (?,?,?)",
+            [(ticker_id, ex_date, amount) for ex_date, amount in rows],
+        )
+
+
+def bulk_insert_prices(ticker_id: int, rows: List[Tuple[str, float]],
+                       conn: Optional[sqlite3.Connection] = None) -> None:
+    """Insert many ``(ex_date, close_price)`` price rows, replacing duplicates."""
+    with _writer(conn) as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO prices (ticker_id, ex_date, close_price) VALUES (?,?,?)",
+            [(ticker_id, ex_date, close_price) for ex_date, close_price in rows],
+        )
+
+
+def bulk_insert_splits(ticker_id: int, rows: List[Tuple[str, float, float]],
+                       conn: Optional[sqlite3.Connection] = None) -> None:
+    """Insert many ``(ex_date, numerator, denominator)`` split rows, ignoring duplicates."""
+    with _writer(conn) as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO splits (ticker_id, ex_date, numerator, denominator) VALUES (?,?,?,?)",
+            [(ticker_id, ex_date, num, den) for ex_date, num, den in rows],
+        )
 
 
 def get_splits(ticker_id: int) -> List[sqlite3.Row]:
     """Get all splits for a ticker sorted by date."""
     conn = get_connection()
-    try:
-        cur = conn.execute(
-            "SELECT * FROM splits WHERE ticker_id = ? ORDER BY ex_date ASC",
-            (ticker_id,)
-        )
-        return list(cur.fetchall())
-    finally:
-        conn.close()
+    cur = conn.execute(
+        "SELECT * FROM splits WHERE ticker_id = ? ORDER BY ex_date ASC",
+        (ticker_id,)
+    )
+    return list(cur.fetchall())
+
+
+def _db_signature() -> Tuple:
+    """Change marker for the database files, used to key read caches.
+
+    Includes the WAL file because committed writes land there first and only
+    reach the main file at checkpoint time.
+    """
+    sig: List[Any] = [str(DB_PATH)]
+    for path in (DB_PATH, DB_PATH.with_name(DB_PATH.name + "-wal")):
+        try:
+            st = os.stat(path)
+            sig.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append(None)
+    return tuple(sig)
 
 
 def get_all_splits() -> List[sqlite3.Row]:
     """Get all splits for all tickers."""
     conn = get_connection()
+    cur = conn.execute("SELECT * FROM splits ORDER BY ex_date ASC")
+    return list(cur.fetchall())
+
+
+@lru_cache(maxsize=1)
+def _all_splits_df_cached(signature: Tuple) -> pd.DataFrame:
+    conn = get_connection()
+    # pandas wants plain tuples; put Row back for the other helpers
+    conn.row_factory = None
     try:
-        cur = conn.execute("SELECT * FROM splits ORDER BY ex_date ASC")
-        return list(cur.fetchall())
+        return pd.read_sql_query("SELECT * FROM splits ORDER BY ex_date ASC", conn)
     finally:
-        conn.close()
+        conn.row_factory = sqlite3.Row
+
+
+def read_all_splits_df() -> pd.DataFrame:
+    """All splits as a DataFrame.
+
+    The result is cached for the life of the process and reloaded whenever
+    the database files change on disk. The same frame is handed to every
+    caller, so treat it as read-only.
+    """
+    return _all_splits_df_cached(_db_signature())
+
+
+# ``year`` is cut straight out of the ISO ex_date so callers that only need
+# the calendar year don't have to parse dates
+DIVIDENDS_SQL = (
+    "SELECT d.*, CAST(substr(d.ex_date, 1, 4) AS INTEGER) AS year, "
+    "t.symbol, t.current_price, p.close_price "
+    "FROM dividends d "
+    "JOIN tickers t ON d.ticker_id = t.id "
+    "LEFT JOIN prices p ON d.ticker_id = p.ticker_id AND d.ex_date = p.ex_date "
+)
 
 
 def query_dividends(filters: str = "", params: Tuple = ()) -> List[sqlite3.Row]:
@@ -224,29 +357,45 @@ def query_dividends(filters: str = "", params: Tuple = ()) -> List[sqlite3.Row]:
     ``filters`` should be a SQL fragment starting with ``WHERE`` or empty.
     ``params`` are the parameters for the placeholders.
     """
-    sql = (
-        "SELECT d.*, t.symbol, t.current_price, p.close_price "
-        "FROM dividends d "
-        "JOIN tickers t ON d.ticker_id = t.id "
-        "LEFT JOIN prices p ON d.ticker_id = p.ticker_id AND d.ex_date = p.ex_date "
+    sql = DIVIDENDS_SQL
+    if filters:
+        sql += " " + filters
+    conn = get_connection()
+    cur = conn.execute(sql, params)
+    return list(cur.fetchall())
+
+
+def get_ticker_by_symbol(symbol: str) -> Optional[sqlite3.Row]:
+    """Return the ticker row for ``symbol`` or ``None`` if it is unknown."""
+    conn = get_connection()
+    cur = conn.execute(
+        "SELECT * FROM tickers WHERE symbol = ? LIMIT 1", (symbol,)
     )
+    return cur.fetchone()
+
+
+def read_dividends_df(filters: str = "", params: Tuple = ()) -> pd.DataFrame:
+    """Same query as :func:`query_dividends`, returned as a typed DataFrame.
+
+    Lets pandas build the columns straight from the cursor instead of going
+    through one ``sqlite3.Row`` and one ``dict`` per dividend.
+    """
+    sql = DIVIDENDS_SQL
     if filters:
         sql += " " + filters
     conn = get_connection()
+    # pandas wants plain tuples; put Row back for the other helpers
+    conn.row_factory = None
     try:
-        cur = conn.execute(sql, params)
-        return list(cur.fetchall())
+        return pd.read_sql_query(sql, conn, params=params)
     finally:
-        conn.close()
+        conn.row_factory = sqlite3.Row
 
 
 def get_all_tickers() -> List[sqlite3.Row]:
     conn = get_connection()
-    try:
-        cur = conn.execute("SELECT * FROM tickers")
-        return list(cur.fetchall())
-    finally:
-        conn.close()
+    cur = conn.execute("SELECT * FROM tickers")
+    return list(cur.fetchall())
 
 # Ensure the DB is initialised on import
 init_db()
@@ -5,15 +5,21 @@ connectivity issues in restricted environments.
 """
 
 import csv
-import io
 import time
-import bisect
 from datetime import datetime, timedelta
 from typing import List, Tuple, Optional, Dict, Any
 
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from . import db
 
+try:
+    import orjson
+except ImportError:  # optional, see the "fast" extra
+    orjson = None
+
 NSE_CSV_URL = "https://archives.nseindia.com/content/equities/EQUITY_L.csv"
 # We use a long range but stick to 1mo to get historical dividends efficiently.
 # For prices, we might need a separate call or just accept 1mo granularity if that's all we get.
@@ -21,37 +27,61 @@ NSE_CSV_URL = "https://archives.nseindia.com/content/equities/EQUITY_L.csv"
 YAHOO_API_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{symbol}?range=max&interval=1mo&events=div%7Csplit"
 
 HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept-Encoding": "gzip, deflate",
 }
 
+# Shared by every request (and every update worker) so TCP/TLS connections
+# are kept alive and reused. The pool is sized above update's default
+# worker count; transient errors are retried with backoff.
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+_adapter = HTTPAdapter(
+    pool_connections=32, pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset({"GET"})),
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
+def _iso_dates(timestamps: List[int]) -> List[str]:
+    """UTC calendar dates (``YYYY-MM-DD``) of Unix ``timestamps``, in one NumPy pass."""
+    secs = np.asarray(timestamps, dtype=np.int64).astype("datetime64[s]")
+    return secs.astype("datetime64[D]").astype(str).tolist()
+
 def download_nse_tickers(force: bool = False) -> int:
     """Download the NSE ticker CSV and insert any new symbols."""
-    response = requests.get(NSE_CSV_URL, headers=HEADERS, timeout=30)
-    response.raise_for_status()
-    text = response.content.decode("utf-8", errors="ignore")
-    reader = csv.DictReader(io.StringIO(text))
-    added = 0
-    for row in reader:
-        row = {k.strip(): v.strip() for k, v in row.items() if k is not None and v is not None}
-        symbol = row.get("SYMBOL")
-        if not symbol:
-            continue
-        series = row.get("SERIES")
-        if series != "EQ":
-            continue
-        yahoo_symbol = f"{symbol}.NS"
-        name = row.get("NAME OF COMPANY")
-        db.upsert_ticker(yahoo_symbol, name=name)
-        added += 1
-    return added
+    rows = []
+    # Stream the CSV line by line rather than decoding it all up front
+    with SESSION.get(NSE_CSV_URL, timeout=30, stream=True) as response:
+        response.raise_for_status()
+        lines = (line.decode("utf-8", errors="ignore") for line in response.iter_lines())
+        reader = csv.reader(lines)
+        header = [h.strip() for h in next(reader, [])]
+        col = {name: i for i, name in enumerate(header)}
+        symbol_i, series_i, name_i = col.get("SYMBOL"), col.get("SERIES"), col.get("NAME OF COMPANY")
+
+        def field(row, i):
+            return row[i].strip() if i is not None and i < len(row) else None
+
+        for row in reader:
+            symbol = field(row, symbol_i)
+            if not symbol or field(row, series_i) != "EQ":
+                continue
+            rows.append((f"{symbol}.NS", field(row, name_i)))
+    # One executemany in one transaction instead of a statement per symbol
+    db.bulk_upsert_tickers(rows)
+    return len(rows)
 
 def fetch_dividends(symbol: str, fetch_price: bool = True) -> Tuple[int, int]:
     """Fetch dividend history for ``symbol`` using Yahoo's chart API."""
     url = YAHOO_API_URL.format(symbol=symbol)
-    response = requests.get(url, headers=HEADERS, timeout=15)
+    response = SESSION.get(url, timeout=15)
     response.raise_for_status()
     
-    data = response.json()
+    # orjson parses the raw bytes directly and is several times faster on
+    # these mostly-numeric payloads
+    data = orjson.loads(response.content) if orjson is not None else response.json()
     result = data.get("chart", {}).get("result", [])
     if not result:
         return (0, 0)
@@ -65,71 +95,61 @@ def fetch_dividends(symbol: str, fetch_price: bool = True) -> Tuple[int, int]:
     dividends_data = events.get("dividends", {})
     splits_data = events.get("splits", {})
     
-    ticker_id = db.upsert_ticker(symbol)
-    if current_price is not None:
-        db.update_ticker_price(ticker_id, float(current_price))
+    # All of this ticker's writes go out in a single commit
+    with db.transaction() as conn:
+        ticker_id = db.upsert_ticker(symbol, conn=conn)
+        if current_price is not None:
+            db.update_ticker_price(ticker_id, float(current_price), conn=conn)
     
-    # Process splits first
-    for _, split in splits_data.items():
-        ts = split.get("date")
-        numerator = split.get("numerator")
-        denominator = split.get("denominator")
-        if ts and numerator and denominator:
-            dt = datetime.utcfromtimestamp(ts)
-            db.insert_split(ticker_id, dt.date().isoformat(), float(numerator), float(denominator))
-
-    if not dividends_data:
-        db.update_ticker_timestamp(ticker_id, datetime.utcnow().isoformat())
-        return (0, 0)
-    
-    new_div = 0
-    new_price = 0
-    
-    # Get available prices and their timestamps
-    timestamps = result[0].get("timestamp", [])
-    quotes = result[0].get("indicators", {}).get("quote", [{}])[0]
-    closes = quotes.get("close", [])
+        # Process splits first
+        split_entries = [
+            (split["date"], float(split["numerator"]), float(split["denominator"]))
+            for split in splits_data.values()
+            if split.get("date") and split.get("numerator") and split.get("denominator")
+        ]
+        split_dates = _iso_dates([ts for ts, _, _ in split_entries])
+        split_rows = [(date_str, num, den) for date_str, (_, num, den) in zip(split_dates, split_entries)]
+        db.bulk_insert_splits(ticker_id, split_rows, conn=conn)
+
+        if not dividends_data:
+            db.update_ticker_timestamp(ticker_id, datetime.utcnow().isoformat(), conn=conn)
+            return (0, 0)
     
-    # Filter out None values and keep sorted for bisect
-    valid_data = [(ts, price) for ts, price in zip(timestamps, closes) if price is not None]
-    valid_data.sort()
+        div_entries = [
+            (div["date"], float(div["amount"])) for div in dividends_data.values()
+            if div.get("amount") is not None and div.get("date") is not None
+        ]
+        div_dates = _iso_dates([ts for ts, _ in div_entries])
+        div_rows = [(date_str, amount) for date_str, (_, amount) in zip(div_dates, div_entries)]
+
+        # Get available prices and their timestamps
+        timestamps = result[0].get("timestamp", [])
+        quotes = result[0].get("indicators", {}).get("quote", [{}])[0]
+        closes = quotes.get("close", [])
     
-    valid_ts = [item[0] for item in valid_data]
-
-    for _, div in dividends_data.items():
-        amount = div.get("amount")
-        ts = div.get("date")
-        if amount is None or ts is None:
-            continue
-            
-        dt = datetime.utcfromtimestamp(ts)
-        date_str = dt.date().isoformat()
-        
-        db.insert_dividend(ticker_id, date_str, float(amount))
-        new_div += 1
-        
-        if fetch_price and valid_ts:
-            # Find the closest price timestamp
-            idx = bisect.bisect_left(valid_ts, ts)
-            
-            # Check neighbors
-            closest_price = None
-            if idx == 0:
-                closest_price = valid_data[0][1]
-            elif idx == len(valid_ts):
-                closest_price = valid_data[-1][1]
-            else:
-                # Pick the one with smallest time diff
-                before = valid_data[idx-1]
-                after = valid_data[idx]
-                if abs(ts - before[0]) <= abs(ts - after[0]):
-                    closest_price = before[1]
-                else:
-                    closest_price = after[1]
-            
-            if closest_price is not None:
-                db.insert_price(ticker_id, date_str, float(closest_price))
-                new_price += 1
-            
-    db.update_ticker_timestamp(ticker_id, datetime.utcnow().isoformat())
-    return (new_div, new_price)
+        # Filter out None values and keep sorted for searchsorted
+        valid_data = [(ts, price) for ts, price in zip(timestamps, closes) if price is not None]
+        valid_data.sort()
+
+        price_rows = []
+        if fetch_price and valid_data and div_entries:
+            valid_ts = np.array([item[0] for item in valid_data], dtype=np.int64)
+            valid_px = np.array([item[1] for item in valid_data], dtype=np.float64)
+            div_ts = np.array([ts for ts, _ in div_entries], dtype=np.int64)
+            # Closest price timestamp for every dividend at once: compare the
+            # neighbours on either side (clamped at the ends), ties go to the
+            # earlier one
+            idx = np.searchsorted(valid_ts, div_ts, side='left')
+            before = np.clip(idx - 1, 0, len(valid_ts) - 1)
+            after = np.clip(idx, 0, len(valid_ts) - 1)
+            nearest = np.where(
+                np.abs(div_ts - valid_ts[before]) <= np.abs(valid_ts[after] - div_ts), before, after)
+            price_rows = [
+                (date_str, price) for (date_str, _), price in zip(div_rows, valid_px[nearest].tolist())
+            ]
+
+        # One executemany per table rather than a statement per row
+        db.bulk_insert_dividends(ticker_id, div_rows, conn=conn)
+        db.bulk_insert_prices(ticker_id, price_rows, conn=conn)
+        db.update_ticker_timestamp(ticker_id, datetime.utcnow().isoformat(), conn=conn)
+        return (len(div_rows), len(price_rows))
@@ -5,10 +5,28 @@ Provides:
 * cagr – compound annual growth rate for dividend totals.
 * classify_years – given a list of yearly totals, return counts of
   (up, stalled, reduced, stopped).
+* fill_year_range – dense yearly array with missing years set to 0.
+* adjust_dividends / adjust_dividends_df – convert Yahoo's backward-adjusted
+  dividends to raw and forward-adjusted amounts.
 """
 
+import importlib.machinery
+import math
 from typing import Sequence, Tuple, List
 
+import numpy as np
+import pandas as pd
+
+from . import _numba_kernels
+from . import _classify_native
+
+# True when _classify_native has been compiled with pythran (the extension
+# module is imported in place of the .py source). Checked against the
+# extension suffixes, since a .pyc-only, zipped or frozen install doesn't
+# end in .py either
+HAVE_NATIVE_CLASSIFY = (getattr(_classify_native, '__file__', None) or '').endswith(
+    tuple(importlib.machinery.EXTENSION_SUFFIXES))
+
 
 def dividend_yield(amount: float, price: float) -> float:
     """Return dividend yield as a percentage.
@@ -29,32 +47,55 @@ def cagr(first: float, last: float, years: int) -> float:
     """
     if years <= 0 or first <= 0:
         return 0.0
-    return ((last / first) ** (1.0 / years) - 1.0) * 100.0
+    return (math.pow(last / first, 1.0 / years) - 1.0) * 100.0
 
 
 def classify_years(yearly_totals: Sequence[float]) -> Tuple[int, int, int, int]:
     """Classify year‑over‑year changes.
 
+    ``yearly_totals`` may be a list or a NumPy array.
+
     Returns a tuple ``(up, stalled, reduced, stopped)`` where:
     * up – current year total > previous year total
     * stalled – equal to previous year total
     * reduced – current year total < previous year total but > 0
     * stopped – current year total == 0
     """
-    up = stalled = reduced = stopped = 0
-    for prev, cur in zip(yearly_totals, yearly_totals[1:]):
-        # Use a small epsilon for float comparison
-        if cur < 1e-6:
-            stopped += 1
-        elif cur > prev + 1e-6:
-            up += 1
-        elif abs(cur - prev) < 1e-6:
-            stalled += 1
-        else:
-            reduced += 1
+    vals = np.ascontiguousarray(yearly_totals, dtype=np.float64)
+    if _numba_kernels.HAVE_NUMBA:
+        # The compiled loop beats the masks below, even on short series
+        return tuple(int(c) for c in _numba_kernels.classify_years_nb(vals))
+    if HAVE_NATIVE_CLASSIFY:
+        return tuple(int(c) for c in _classify_native.classify_years(vals))
+    prev, cur = vals[:-1], vals[1:]
+    # Tolerant float comparison (see _numba_kernels); each change lands in
+    # the first of stopped / up / stalled that matches, otherwise reduced
+    tol = _numba_kernels.STALL_ATOL + _numba_kernels.STALL_RTOL * np.abs(prev)
+    is_stopped = cur < _numba_kernels.STOPPED_EPS
+    is_up = ~is_stopped & (cur > prev + tol)
+    is_stalled = ~is_stopped & ~is_up & (np.abs(cur - prev) <= tol)
+    # The masks are exclusive, so they combine into one category code per
+    # change (0 up, 1 stalled, 2 reduced, 3 stopped) counted in one pass
+    code = 2 - 2 * is_up.view(np.uint8) - is_stalled.view(np.uint8) + is_stopped.view(np.uint8)
+    up, stalled, reduced, stopped = np.bincount(code, minlength=4).tolist()
     return up, stalled, reduced, stopped
 
 
+def fill_year_range(years: Sequence[int], totals: Sequence[float]) -> np.ndarray:
+    """Return ``totals`` (one per entry of ``years``) as a dense float array.
+
+    One slot per calendar year from the first year to the last; years
+    without an entry are 0.
+    """
+    years = np.asarray(years, dtype=np.int64)
+    if years.size == 0:
+        return np.zeros(0)
+    first = years.min()
+    vals = np.zeros(int(years.max() - first) + 1)
+    vals[years - first] = np.asarray(totals, dtype=np.float64)
+    return vals
+
+
 def adjust_dividends(dividends: List[dict], splits: List[dict]) -> List[dict]:
     """Adjust dividend amounts: Yahoo backward-adjusted -> RAW -> Forward-adjusted.
     
@@ -67,45 +108,94 @@ def adjust_dividends(dividends: List[dict], splits: List[dict]) -> List[dict]:
     Step 2 (RAW -> Forward): Multiply by cumulative splits AT THAT TIME
     
     The 'amount' field will be forward-adjusted (total from 1 original share at that time).
+
+    One ticker's dividends and splits as lists of mappings; the CLI uses
+    :func:`adjust_dividends_df`, this is a thin wrapper over it kept for
+    library callers.
     """
-    sorted_splits = sorted(splits, key=lambda x: x['ex_date'])
-    sorted_divs = sorted(dividends, key=lambda x: x['ex_date'])
-    
+    if not dividends:
+        return []
+
+    # Only the fields the adjustment needs go through the frame; the output
+    # dicts are copies of the inputs, found again by their position
+    divs = pd.DataFrame({
+        'ticker_id': 0,
+        'ex_date': [d['ex_date'] for d in dividends],
+        'amount': [d['amount'] for d in dividends],
+        'close_price': [d.get('close_price') or np.nan for d in dividends],
+        'position': range(len(dividends)),
+    })
+    split_frame = pd.DataFrame(
+        [(0, s['ex_date'], s['numerator'], s['denominator']) for s in splits],
+        columns=['ticker_id', 'ex_date', 'numerator', 'denominator'])
+    result = adjust_dividends_df(divs, split_frame)
+
     adjusted = []
-    
-    for div in sorted_divs:
-        # Calculate splits AFTER this dividend date (for RAW conversion)
-        # Yahoo backward-adjusts by dividing by these splits, so we multiply to reverse
-        splits_after = 1.0
-        # Calculate cumulative splits AT THIS TIME (for forward adjustment)
-        splits_at_time = 1.0
-        
-        for split in sorted_splits:
-            if split['ex_date'] > div['ex_date']:
-                splits_after *= (split['numerator'] / split['denominator'])
-            elif split['ex_date'] <= div['ex_date']:
-                splits_at_time *= (split['numerator'] / split['denominator'])
-        
-        new_div = dict(div)
-        
-        # Step 1: Yahoo backward-adjusted -> RAW
-        # Multiply by splits that happen AFTER this dividend date
-        raw_amount = div['amount'] * splits_after
-        
-        # Step 2: RAW -> Forward-adjusted (total from 1 original share at that time)
-        # Multiply by cumulative splits AT THAT TIME
-        forward_amount = raw_amount * splits_at_time
-        
-        new_div['amount'] = forward_amount
-        new_div['raw_amount'] = raw_amount
-        new_div['splits_at_time'] = splits_at_time
-        
-        if div.get('close_price'):
-            # Yahoo prices are also backward-adjusted, so convert to raw the same way
-            # Multiply by splits AFTER to get the raw historical price
-            raw_price = div['close_price'] * splits_after
+    for i, forward_amount, raw_amount, at, raw_price in zip(
+            result['position'].tolist(), result['amount'].tolist(), result['raw_amount'].tolist(),
+            result['splits_at_time'].tolist(), result['close_price'].tolist()):
+        # Unpacking accepts any mapping (e.g. sqlite3.Row), unlike dict |
+        new_div = {
+            **dividends[i],
+            'amount': forward_amount, 'raw_amount': raw_amount, 'splits_at_time': at,
+        }
+        # Only truthy prices are adjusted; None / 0 are passed through untouched
+        if dividends[i].get('close_price'):
             new_div['close_price'] = raw_price
-            
         adjusted.append(new_div)
-        
+
     return adjusted
+
+
+def adjust_dividends_df(dividends: pd.DataFrame, splits: pd.DataFrame) -> pd.DataFrame:
+    """Vectorized :func:`adjust_dividends` over many tickers at once.
+
+    ``dividends`` needs ``ticker_id``, ``ex_date`` and ``amount`` columns (and
+    optionally ``close_price``); ``splits`` needs ``ticker_id``, ``ex_date``,
+    ``numerator`` and ``denominator``.
+
+    Per ticker the splits are turned into cumulative products, which are
+    attached to each dividend with ``merge_asof``: the product of splits on or
+    before the ex-date gives ``splits_at_time`` and the product of splits
+    strictly after it gives the factor to undo Yahoo's backward adjustment.
+
+    Returns the dividends sorted by ``ex_date`` (parsed to datetime) with the
+    same ``amount``, ``raw_amount``, ``splits_at_time`` and ``close_price``
+    values as :func:`adjust_dividends`.
+    """
+    divs = dividends.copy()
+    # ex_dates are stored as ISO dates; a fixed format skips per-value inference
+    divs['ex_date'] = pd.to_datetime(divs['ex_date'], format='%Y-%m-%d')
+    divs = divs.sort_values('ex_date', kind='stable').reset_index(drop=True)
+
+    if splits.empty:
+        splits_at_time = 1.0
+        splits_after = 1.0
+    else:
+        s = splits[['ticker_id', 'ex_date', 'numerator', 'denominator']].copy()
+        s['ticker_id'] = s['ticker_id'].astype(divs['ticker_id'].dtype)
+        s['ex_date'] = pd.to_datetime(s['ex_date'], format='%Y-%m-%d')
+        s = s.sort_values(['ticker_id', 'ex_date'])
+        s['ratio'] = s['numerator'] / s['denominator']
+        # Product of this split and all earlier / all later ones, per ticker
+        s['at_time'] = s.groupby('ticker_id')['ratio'].cumprod()
+        s['after'] = s.iloc[::-1].groupby('ticker_id')['ratio'].cumprod()
+        s = s.sort_values('ex_date', kind='stable')
+
+        keys = divs[['ticker_id', 'ex_date']]
+        at_time = pd.merge_asof(keys, s[['ticker_id', 'ex_date', 'at_time']],
+                                on='ex_date', by='ticker_id', direction='backward')
+        after = pd.merge_asof(keys, s[['ticker_id', 'ex_date', 'after']],
+                              on='ex_date', by='ticker_id', direction='forward',
+                              allow_exact_matches=False)
+        splits_at_time = at_time['at_time'].fillna(1.0).to_numpy()
+        splits_after = after['after'].fillna(1.0).to_numpy()
+
+    raw_amount = divs['amount'].to_numpy(dtype=float) * splits_after
+    divs['raw_amount'] = raw_amount
+    divs['amount'] = raw_amount * splits_at_time
+    divs['splits_at_time'] = splits_at_time
+    if 'close_price' in divs.columns:
+        # Yahoo prices are backward-adjusted the same way as dividends
+        divs['close_price'] = divs['close_price'].astype(float) * splits_after
+    return divs
@@ -0,0 +1,110 @@
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from click.testing import CliRunner
+
+from dividend_calculator import cli, db
+
+
+class TestCondition(unittest.TestCase):
+    def setUp(self):
+        self.metrics = {
+            'up': np.array([5, 0, 3]),
+            'stopped': np.array([0, 2, 1]),
+            'c3': np.array([4.0, 0.0, 12.5]),
+            'c5': np.array([0.0, 11.0, 2.0]),
+        }
+
+    def _evaluate(self, condition):
+        return cli.evaluate_condition(
+            cli.compile_condition(condition),
+            cli.compile_condition_vectorized(condition),
+            self.metrics, 3,
+        )
+
+    def test_vectorized_matches_scalar(self):
+        for condition in ["up > 2 and not stopped", "stopped or c3 > 10",
+                          "1 < up <= 5", "(c3 if up else 100) > 5", "1",
+                          "(c3 or c5) > 10", "(up and c3) > 10",
+                          # Overflows int64
+                          "up ** 40 > 0"]:
+            mask, errors = self._evaluate(condition)
+            expected = [
+                bool(eval(condition, {}, {k: v[i].item() for k, v in self.metrics.items()}))
+                for i in range(3)
+            ]
+            self.assertEqual(mask.tolist(), expected, condition)
+            self.assertEqual(errors, [])
+
+    @unittest.skipIf(cli.numexpr is None, "numexpr not installed")
+    def test_numexpr_matches_numpy(self):
+        for condition in ["up > 2 and not stopped", "(c3 if up else 100) > 5",
+                          "(c3 or c5) > 10",
+                          # Overflows int64
+                          "up * 9007199254740992 * 1024 > 0"]:
+            mask, _ = self._evaluate(condition)
+            ne_mask, _ = cli.evaluate_condition(
+                cli.compile_condition(condition),
+                cli.compile_condition_vectorized(condition),
+                self.metrics, 3, cli.compile_condition_numexpr(condition),
+            )
+            self.assertEqual(ne_mask.tolist(), mask.tolist(), condition)
+
+    def test_numexpr_skips_non_python_semantics(self):
+        self.assertIsNone(cli._numexpr_source(cli._parse_condition("(c3 or c5) > 10")))
+        self.assertIsNone(cli._numexpr_source(cli._parse_condition("(not up) + 1 > 0")))
+        self.assertIsNotNone(cli._numexpr_source(cli._parse_condition("up > 2 and not stopped")))
+        # Integer constants too large to be exact as floats
+        self.assertIsNone(cli._numexpr_source(cli._parse_condition("up * 4000000000000000000 > 0")))
+
+    def test_row_errors_fall_back_to_scalar(self):
+        mask, errors = self._evaluate("c3 / up > 1")
+        self.assertEqual(mask.tolist(), [False, False, True])
+        self.assertEqual([row for row, _ in errors], [1])
+        self.assertIsInstance(errors[0][1], ZeroDivisionError)
+
+    def test_rejects_unsafe_syntax(self):
+        with self.assertRaises(ValueError):
+            cli.compile_condition("().__class__")
+        with self.assertRaises(ValueError):
+            cli.compile_condition("bogus > 1")
+        for condition in ["up is 5", "up is not 5", "up in up", "up not in up"]:
+            with self.assertRaises(ValueError):
+                cli.compile_condition(condition)
+
+
+class TestFilter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved_path = db.DB_PATH
+        db.DB_PATH = Path(self.tmp.name) / "test.db"
+        db.init_db()
+        # No current_price: the ticker's price is NULL
+        with db.transaction() as conn:
+            ticker_id = db.upsert_ticker("NOPRICE.NS", conn=conn)
+            last_year = datetime.now().year - 1
+            db.bulk_insert_dividends(
+                ticker_id, [(f"{year}-06-01", 1.0) for year in range(last_year - 5, last_year + 1)],
+                conn=conn)
+
+    def tearDown(self):
+        db._reset_connection()
+        db.DB_PATH = self.saved_path
+        self.tmp.cleanup()
+
+    def test_missing_price_counts_as_zero_in_condition(self):
+        result = CliRunner().invoke(cli.main, ["filter", "--condition", "price < 500"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("NOPRICE.NS", result.output)
+
+    def test_invalid_condition_is_a_usage_error(self):
+        result = CliRunner().invoke(cli.main, ["filter", "--condition", "bogus > 1"])
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("--condition", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
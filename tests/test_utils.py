@@ -1,5 +1,13 @@
+import math
 import unittest
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
 from dividend_calculator import utils
+from dividend_calculator import _numba_kernels
+from dividend_calculator import _classify_native
 
 class TestUtils(unittest.TestCase):
     def test_dividend_yield(self):
@@ -29,5 +37,114 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(reduced, 1)
         self.assertEqual(stopped, 1)
 
+        # The stalled tolerance scales with the payout: rounding drift on a
+        # large total is stalled, a real change on a tiny one is not
+        drift = [1e6, 1e6 + 0.5, 0.01, 0.0100001]
+        self.assertEqual(utils.classify_years(drift), (1, 1, 1, 0))
+        self.assertEqual(tuple(_numba_kernels.classify_years_nb(np.asarray(drift))), (1, 1, 1, 0))
+
+    def test_classify_years_kernel_matches_utils(self):
+        totals = [10, 12, 12, 8, 0, 5]
+        vals = np.asarray(totals, dtype=np.float64)
+        self.assertEqual(tuple(_numba_kernels.classify_years_nb(vals)),
+                         utils.classify_years(totals))
+
+    def test_classify_native_matches_kernel(self):
+        # The pythran source duplicates the kernel's thresholds
+        vals = np.asarray([10, 12, 12, 8, 0, 5, 1e6, 1e6 + 0.5, 0.01, 0.0100001])
+        self.assertEqual(tuple(_classify_native.classify_years(vals)),
+                         tuple(_numba_kernels.classify_years_nb(vals)))
+
+    def test_fill_year_range(self):
+        vals = utils.fill_year_range([2018, 2019, 2022], [5.0, 7.0, 2.0])
+        np.testing.assert_array_equal(vals, [5.0, 7.0, 0.0, 0.0, 2.0])
+        self.assertEqual(utils.fill_year_range([], []).size, 0)
+
+    def test_cagr_for_years_kernel(self):
+        vals = np.asarray([0, 100, 0, 121], dtype=np.float64)
+        # Window of 3 years starts at a zero year, so growth runs 100 -> 121 over 2 years
+        self.assertAlmostEqual(_numba_kernels.cagr_for_years_nb(vals, 3), utils.cagr(100, 121, 2))
+        # Window longer than the series
+        self.assertTrue(math.isnan(_numba_kernels.cagr_for_years_nb(vals, 5)))
+        # Only one non-zero year in the window
+        self.assertTrue(math.isnan(_numba_kernels.cagr_for_years_nb(vals, 1)))
+
+    def test_ticker_metrics_kernel_matches_per_ticker(self):
+        years = np.array([2018, 2019, 2021, 2020, 2021, 2022, 2023], dtype=np.int64)
+        totals = np.array([10.0, 12.0, 12.0, 5.0, 4.0, 4.0, 6.0])
+        starts = np.array([0, 3], dtype=np.int64)
+        ends = np.array([3, 7], dtype=np.int64)
+        periods = np.array([1, 3], dtype=np.int64)
+        counts, overall, cagrs = _numba_kernels.ticker_metrics_nb(years, totals, starts, ends, periods)
+        for i in range(2):
+            vals = utils.fill_year_range(years[starts[i]:ends[i]], totals[starts[i]:ends[i]])
+            self.assertEqual(tuple(counts[i]), utils.classify_years(vals))
+            self.assertAlmostEqual(overall[i], _numba_kernels.cagr_for_years_nb(vals, vals.size - 1))
+            np.testing.assert_allclose(
+                cagrs[i], [_numba_kernels.cagr_for_years_nb(vals, n) for n in periods])
+
+    def test_adjust_dividends(self):
+        dividends = [
+            {'ex_date': '2020-01-10', 'amount': 3.0, 'close_price': 80.0},
+            {'ex_date': '2010-06-01', 'amount': 1.0, 'close_price': 50.0},
+            {'ex_date': '2015-03-01', 'amount': 2.0, 'close_price': None},
+        ]
+        splits = [
+            {'ex_date': '2020-01-10', 'numerator': 5.0, 'denominator': 1.0},
+            {'ex_date': '2012-01-01', 'numerator': 2.0, 'denominator': 1.0},
+        ]
+        result = utils.adjust_dividends(dividends, splits)
+        self.assertEqual([d['ex_date'] for d in result], ['2010-06-01', '2015-03-01', '2020-01-10'])
+        # A split on the ex-date counts as already happened
+        self.assertEqual([d['raw_amount'] for d in result], [10.0, 10.0, 3.0])
+        self.assertEqual([d['amount'] for d in result], [10.0, 20.0, 30.0])
+        self.assertEqual([d['splits_at_time'] for d in result], [1.0, 2.0, 10.0])
+        self.assertEqual([d['close_price'] for d in result], [500.0, None, 80.0])
+
+        self.assertEqual(utils.adjust_dividends([], splits), [])
+        unsplit = utils.adjust_dividends(dividends, [])
+        self.assertEqual([d['amount'] for d in unsplit], [1.0, 2.0, 3.0])
+
+        # Any mapping works as a dividend, not just dict
+        class Row(Mapping):
+            def __init__(self, data):
+                self._data = data
+            def __getitem__(self, key):
+                return self._data[key]
+            def __iter__(self):
+                return iter(self._data)
+            def __len__(self):
+                return len(self._data)
+
+        self.assertEqual(utils.adjust_dividends([Row(d) for d in dividends], splits), result)
+
+    def test_adjust_dividends_df_matches_list_version(self):
+        dividends = [
+            {'ticker_id': 1, 'ex_date': '2010-06-01', 'amount': 1.0, 'close_price': 50.0},
+            {'ticker_id': 1, 'ex_date': '2015-03-01', 'amount': 2.0, 'close_price': None},
+            {'ticker_id': 1, 'ex_date': '2020-01-10', 'amount': 3.0, 'close_price': 80.0},
+            {'ticker_id': 2, 'ex_date': '2012-05-05', 'amount': 4.0, 'close_price': 10.0},
+        ]
+        splits = [
+            {'ticker_id': 1, 'ex_date': '2012-01-01', 'numerator': 2.0, 'denominator': 1.0},
+            {'ticker_id': 1, 'ex_date': '2020-01-10', 'numerator': 5.0, 'denominator': 1.0},
+        ]
+        expected = []
+        for tid in (1, 2):
+            expected.extend(utils.adjust_dividends(
+                [d for d in dividends if d['ticker_id'] == tid],
+                [s for s in splits if s['ticker_id'] == tid]))
+        expected = pd.DataFrame(expected).sort_values('ex_date').reset_index(drop=True)
+
+        result = utils.adjust_dividends_df(pd.DataFrame(dividends), pd.DataFrame(splits))
+        for col in ('amount', 'raw_amount', 'splits_at_time', 'close_price'):
+            np.testing.assert_allclose(result[col].to_numpy(dtype=float),
+                                       expected[col].to_numpy(dtype=float))
+
+        no_splits = utils.adjust_dividends_df(
+            pd.DataFrame(dividends),
+            pd.DataFrame(columns=['ticker_id', 'ex_date', 'numerator', 'denominator']))
+        np.testing.assert_allclose(no_splits['raw_amount'], no_splits['amount'])
+
 if __name__ == "__main__":
     unittest.main()